@@ -11,10 +11,10 @@ from pprint import pprint
 
 # Login parameters for connecting to a LIMS instance.
 from genologics.config import BASEURI, PASSWORD, USERNAME
-from genologics.lims import Lims, Project
+from genologics.lims import Project, get_default_lims
 
 # Create the LIMS interface instance, and check the connection and version.
-lims = Lims(BASEURI, USERNAME, PASSWORD)
+lims = get_default_lims(BASEURI, USERNAME, PASSWORD)
 lims.check_version()
 
 project = Project(lims, id="P193")
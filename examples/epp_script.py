@@ -19,7 +19,7 @@ from argparse import ArgumentParser
 from genologics.config import BASEURI, PASSWORD, USERNAME
 from genologics.entities import Artifact, Process
 from genologics.epp import EppLogger, attach_file
-from genologics.lims import Lims
+from genologics.lims import get_default_lims
 
 
 def main(lims, pid, file):
@@ -60,7 +60,7 @@ if __name__ == "__main__":
 
     # Log everything to log argument
     with EppLogger(args.log):
-        lims = Lims(BASEURI, USERNAME, PASSWORD)
+        lims = get_default_lims(BASEURI, USERNAME, PASSWORD)
         lims.check_version()
 
         main(lims, args.pid, args.file)
@@ -7,12 +7,14 @@ Usage example: Get artifacts and artifact info.
 Per Kraulis, Science for Life Laboratory, Stockholm, Sweden.
 """
 
+from concurrent.futures import ThreadPoolExecutor
+
 # Login parameters for connecting to a LIMS instance.
 from genologics.config import BASEURI, PASSWORD, USERNAME
-from genologics.lims import Lims
+from genologics.lims import get_default_lims
 
 # Create the LIMS interface instance, and check the connection and version.
-lims = Lims(BASEURI, USERNAME, PASSWORD)
+lims = get_default_lims(BASEURI, USERNAME, PASSWORD)
 lims.check_version()
 
 # Get the list of all artifacts.
@@ -30,17 +32,32 @@ lims.check_version()
 ## artifacts = lims.get_artifacts(working_flag=True)
 ## print len(artifacts), 'Working-flag True artifacts'
 
+# The two queries below are independent, so run them concurrently. The
+# Lims instance shares one pooled HTTP session between the threads.
 name = "jgr33"
-artifacts = lims.get_artifacts(sample_name=name)
+with ThreadPoolExecutor() as executor:
+    by_name = executor.submit(lims.get_artifacts, sample_name=name)
+    passed = executor.submit(lims.get_artifacts, qc_flag="PASSED")
+    artifacts = by_name.result()
+    passed_artifacts = passed.result()
+
 print(len(artifacts), "artifacts for sample name", name)
 
+# Fetch the XML of all artifacts in a single batch request. The name is then
+# read from the already loaded XML and the state is parsed from the URI, so
+# the loop below does not issue any further requests.
 artifacts = lims.get_batch(artifacts)
 for artifact in artifacts:
     print(artifact, artifact.name, artifact.state)
 
+# Related entities are not loaded by the batch call; fetch them with one
+# further batch request rather than one GET per sample.
+samples = lims.get_batch([s for artifact in artifacts for s in artifact.samples])
+for sample in samples:
+    print(sample, sample.name)
+
 print()
-artifacts = lims.get_artifacts(qc_flag="PASSED")
-print(len(artifacts), "QC PASSED artifacts")
-artifacts = lims.get_batch(artifacts)
+print(len(passed_artifacts), "QC PASSED artifacts")
+artifacts = lims.get_batch(passed_artifacts)
 for artifact in artifacts:
     print(artifact, artifact.name, artifact.state)
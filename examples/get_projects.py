@@ -7,25 +7,32 @@ Usage example: Get some projects.
 Per Kraulis, Science for Life Laboratory, Stockholm, Sweden.
 """
 
+from concurrent.futures import ThreadPoolExecutor
+
 # Login parameters for connecting to a LIMS instance.
 from genologics.config import BASEURI, PASSWORD, USERNAME
-from genologics.lims import Lims, Project
+from genologics.lims import Project, get_default_lims
 
 # Create the LIMS interface instance, and check the connection and version.
-lims = Lims(BASEURI, USERNAME, PASSWORD)
+lims = get_default_lims(BASEURI, USERNAME, PASSWORD)
 lims.check_version()
 
-# Get the list of all projects.
-projects = lims.get_projects()
-print(len(projects), "projects in total")
-
-# Get the list of all projects opened since May 30th 2012.
+# The following requests are independent of each other, so run them
+# concurrently over the pooled HTTP session of the Lims instance.
 day = "2012-05-30"
-projects = lims.get_projects(open_date=day)
-print(len(projects), "projects opened since", day)
-
-# Get the project with the specified LIMS id, and print some info.
 project = Project(lims, id="P193")
+with ThreadPoolExecutor() as executor:
+    # Get the list of all projects.
+    all_projects = executor.submit(lims.get_projects)
+    # Get the list of all projects opened since May 30th 2012.
+    opened_projects = executor.submit(lims.get_projects, open_date=day)
+    # Get the project with the specified LIMS id.
+    executor.submit(project.get).result()
+
+print(len(all_projects.result()), "projects in total")
+print(len(opened_projects.result()), "projects opened since", day)
+
+# Print some info on the project.
 print(project, project.name, project.open_date, project.close_date)
 
 print("    UDFs:")
@@ -9,10 +9,10 @@ Per Kraulis, Science for Life Laboratory, Stockholm, Sweden.
 
 # Login parameters for connecting to a LIMS instance.
 from genologics.config import BASEURI, PASSWORD, USERNAME
-from genologics.lims import Lims, Project, Sample
+from genologics.lims import Project, Sample, get_default_lims
 
 # Create the LIMS interface instance, and check the connection and version.
-lims = Lims(BASEURI, USERNAME, PASSWORD)
+lims = get_default_lims(BASEURI, USERNAME, PASSWORD)
 lims.check_version()
 
 # Get the list of all samples.
@@ -8,9 +8,9 @@ Per Kraulis, Science for Life Laboratory, Stockholm, Sweden.
 """
 
 from genologics.config import BASEURI, PASSWORD, USERNAME
-from genologics.lims import Lims, Project
+from genologics.lims import Project, get_default_lims
 
-lims = Lims(BASEURI, USERNAME, PASSWORD)
+lims = get_default_lims(BASEURI, USERNAME, PASSWORD)
 lims.check_version()
 
 project = Project(lims, id="KRA61")
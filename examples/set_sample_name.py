@@ -9,10 +9,10 @@ Per Kraulis, Science for Life Laboratory, Stockholm, Sweden.
 
 # Login parameters for connecting to a LIMS instance.
 from genologics.config import BASEURI, PASSWORD, USERNAME
-from genologics.lims import Lims, Sample
+from genologics.lims import Sample, get_default_lims
 
 # Create the LIMS interface instance, and check the connection and version.
-lims = Lims(BASEURI, USERNAME, PASSWORD)
+lims = get_default_lims(BASEURI, USERNAME, PASSWORD)
 lims.check_version()
 
 # Get the sample with the given LIMS identifier, and output its current name.
@@ -15,7 +15,8 @@ spec_config = None
 
 def get_config_info(config_file):
     config = ConfigParser()
-    config.read_file(open(config_file))
+    with open(config_file) as f:
+        config.read_file(f)
 
     BASEURI = config.get("genologics", "BASEURI").rstrip()
     USERNAME = config.get("genologics", "USERNAME").rstrip()
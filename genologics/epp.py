@@ -6,35 +6,50 @@ Johannes Alneberg, Science for Life Laboratory, Stockholm, Sweden.
 Copyright (C) 2013 Johannes Alneberg
 """
 
+import atexit
 import csv
 import logging
 import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
-from shutil import copy
+from importlib.metadata import PackageNotFoundError, version
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from shutil import copyfile
 from time import localtime, strftime
 
-import pkg_resources
-from pkg_resources import DistributionNotFound
 from requests import HTTPError
 
 from genologics.config import MAIN_LOG
 from genologics.entities import Artifact
 
+# Row names that are not formatted unless explicitly asked for
+_ROW_NAME_EXCEPTIONS = frozenset(["Sample", "Fail", ""])
 
-def attach_file(src, resource):
+
+def attach_file(src, resource, dest_dir=None):
     """Attach file at src to given resource
 
-    Copies the file to the current directory, EPP node will upload this file
-    automatically if the process output is properly set up"""
+    Copies the file to dest_dir, by default the current directory, EPP node
+    will upload this file automatically if the process output is properly
+    set up"""
+    if dest_dir is None:
+        dest_dir = os.getcwd()
     original_name = os.path.basename(src)
     new_name = resource.id + "_" + original_name
-    dir = os.getcwd()
-    location = os.path.join(dir, new_name)
-    copy(src, location)
+    location = os.path.join(dest_dir, new_name)
+    copyfile(src, location)
     return location
 
 
+def attach_files(files, dest_dir=None):
+    """Attach each file to its resource, given as (src, resource) pairs
+
+    Returns the list of locations the files were copied to, see attach_file"""
+    if dest_dir is None:
+        dest_dir = os.getcwd()
+    return [attach_file(src, resource, dest_dir) for src, resource in files]
+
+
 class EmptyError(ValueError):
     "Raised if an iterator is unexpectedly empty."
 
@@ -83,11 +98,8 @@ class EppLogger:
         logging.info(f"Executing file: {sys.argv[0]}")
         logging.info(f"with parameters: {sys.argv[1:]}")
         try:
-            logging.info(
-                f"Version of {self.PACKAGE}: "
-                + pkg_resources.require(self.PACKAGE)[0].version
-            )
-        except DistributionNotFound as e:
+            logging.info(f"Version of {self.PACKAGE}: " + version(self.PACKAGE))
+        except PackageNotFoundError as e:
             logging.error(e)
             logging.error(f"Make sure you have the {self.PACKAGE} " "package installed")
             sys.exit(-1)
@@ -96,6 +108,7 @@ class EppLogger:
     def __exit__(self, exc_type, exc_val, exc_tb):
         # If no exception has occured in block, turn off logging.
         if not exc_type:
+            self._stop_listener()
             logging.shutdown()
             sys.stderr = self.saved_stderr
             sys.stdout = self.saved_stdout
@@ -137,10 +150,11 @@ class EppLogger:
         self.logger = logging.getLogger()
         self.logger.setLevel(self.level)
         formatter = logging.Formatter("%(asctime)s:%(levelname)s:%(name)s:%(message)s")
+        file_handlers = []
         if self.log_file:
             individual_fh = logging.FileHandler(self.log_file, mode="a")
             individual_fh.setFormatter(formatter)
-            self.logger.addHandler(individual_fh)
+            file_handlers.append(individual_fh)
 
         if MAIN_LOG:
             # Rotating file handler, that will create up to 10 backup logs,
@@ -149,10 +163,38 @@ class EppLogger:
                 MAIN_LOG, mode="a", maxBytes=1e8, backupCount=10
             )
             main_fh.setFormatter(formatter)
-            self.logger.addHandler(main_fh)
-        else:
+            file_handlers.append(main_fh)
+
+        # The file handlers are run by a background thread, so logging only
+        # puts the record on a queue and does not wait for the disk.
+        self.listener = None
+        if file_handlers:
+            log_queue = queue.Queue(-1)
+            self.queue_handler = QueueHandler(log_queue)
+            self.logger.addHandler(self.queue_handler)
+            self.listener = QueueListener(
+                log_queue, *file_handlers, respect_handler_level=True
+            )
+            self.listener.start()
+            # Records logged after an exception left the block, such as the
+            # traceback, are written before the interpreter exits.
+            atexit.register(self._stop_listener)
+
+        if not MAIN_LOG:
             self.logger.warning("No main log file found.")
 
+    def _stop_listener(self):
+        """Write all queued records and stop the background logging thread.
+
+        The file handlers are then attached to the root logger directly, so
+        records logged afterwards are still written to the log files."""
+        if self.listener is not None:
+            self.logger.removeHandler(self.queue_handler)
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                self.logger.addHandler(handler)
+            self.listener = None
+
     def prepend_old_log(self, external_log_file=None):
         """Prepend the old log to the new log.
 
@@ -177,7 +219,10 @@ class EppLogger:
                     log_path = log_artifact.files[0].content_location.split(
                         self.lims.baseuri.split(":")[1]
                     )[1]
-                    copy(log_path, local_log_path)
+                    # The new log is appended to this copy by the file handler
+                    # opened in append mode afterwards. copyfile lets the
+                    # kernel copy the data (sendfile) where available.
+                    copyfile(log_path, local_log_path)
                     with open(local_log_path, "a") as f:
                         f.write("=" * 80 + "\n")
             except HTTPError:  # Probably no artifact found, skip prepending
@@ -214,8 +259,10 @@ class EppLogger:
         def write(self, buf):
             if self.stream:
                 self.stream.write(buf)
-            for line in buf.rstrip().splitlines():
-                self.logger.log(self.log_level, line.rstrip())
+            # A single record for all lines, formatting handles the newlines
+            lines = [line.rstrip() for line in buf.rstrip().splitlines()]
+            if lines:
+                self.logger.log(self.log_level, "\n".join(lines))
 
 
 class ReadResultFiles:
@@ -245,15 +292,15 @@ class ReadResultFiles:
         for outart in outarts:
             file_path = self.get_file_path(outart)
             if file_path:
-                of = open(file_path)
                 file_ext = file_path.split(".")[-1]
-                if file_ext == "csv":
-                    pf = [row for row in csv.reader(of.read().splitlines())]
-                    parsed_files[outart.name] = pf
-                elif file_ext == "txt":
-                    pf = [row.strip().strip("\\").split("\t") for row in of.readlines()]
-                    parsed_files[outart.name] = pf
-                of.close()
+                # Rows are read one at a time rather than the whole file at once
+                with open(file_path, newline="") as of:
+                    if file_ext == "csv":
+                        pf = list(csv.reader(of))
+                        parsed_files[outart.name] = pf
+                    elif file_ext == "txt":
+                        pf = [row.strip().strip("\\").split("\t") for row in of]
+                        parsed_files[outart.name] = pf
         return parsed_files
 
     def format_file(
@@ -288,7 +335,7 @@ class ReadResultFiles:
         keys = []
         error_message = ""
         duplicated_lines = []
-        exeptions = ["Sample", "Fail", ""]
+        find_keys = set(find_keys)
         if not isinstance(first_header, list):
             if first_header:
                 first_header = [first_header]
@@ -297,19 +344,15 @@ class ReadResultFiles:
         for row, line in enumerate(parsed_file):
             if keys and len(line) == len(keys):
                 root_key = line[root_key_col]
-                cond1 = find_keys == [] and root_key not in exeptions
+                cond1 = not find_keys and root_key not in _ROW_NAME_EXCEPTIONS
                 cond2 = root_key in find_keys
                 if root_key in file_info:
                     duplicated_lines.append(root_key)
-                elif cond1 or cond2:
+                elif duplicated_lines and (cond1 or cond2):
+                    # The file will be rejected, only keep track of row names
                     file_info[root_key] = {}
-                    if not duplicated_lines:
-                        for col in range(len(keys)):
-                            if keys[col] != "":
-                                file_info[root_key][keys[col]] = line[col]
-                            elif keys[col - 1] != "":
-                                tupl = (file_info[root_key][keys[col - 1]], line[col])
-                                file_info[root_key][keys[col - 1]] = tupl
+                elif cond1 or cond2:
+                    file_info[root_key] = self._format_line(keys, line)
 
             head = line[root_key_col] if len(line) > root_key_col else None
             if first_header and head in first_header:
@@ -328,6 +371,17 @@ class ReadResultFiles:
             sys.exit(-1)
         return file_info
 
+    def _format_line(self, keys, line):
+        """Map the header keys to the values of a line. A value under an
+        empty header is paired up with the value of the column before."""
+        line_info = {}
+        for col, (key, value) in enumerate(zip(keys, line)):
+            if key != "":
+                line_info[key] = value
+            elif keys[col - 1] != "":
+                line_info[keys[col - 1]] = (line_info[keys[col - 1]], value)
+        return line_info
+
 
 class CopyField:
     """Class to copy any filed (or udf) from any lims element to any
@@ -342,7 +396,9 @@ class CopyField:
                     s_field_name will be used.
 
     The copy_udf() function takes a log file as optional argument.
-    If this is given the changes will be logged there.
+    If this is given the changes will be logged there. It also takes an
+    optional CopyFieldBatch, in which case the destination element is
+    saved together with all others in the batch instead of right away.
 
     Written by Maya Brandi and Johannes Alnberg
     """
@@ -356,19 +412,17 @@ class CopyField:
         self.d_elt = d_elt
         self.d_type = d_elt._URI
         self.d_udf_name = d_udf_name
-        self.old_dest_udf = self._get_field(d_elt, d_udf_name)
+        # The destination is always a udf, never an attribute of the element
+        self.old_dest_udf = d_elt.udf.get(d_udf_name)
 
     def _current_time(self):
         return strftime("%Y-%m-%d %H:%M:%S", localtime())
 
     def _get_field(self, elt, field):
-        if field in elt.udf:
-            return elt.udf[field]
-        else:
-            try:
-                return elt.field
-            except:
-                return None
+        val = elt.udf.get(field)
+        if val is not None:
+            return val
+        return getattr(elt, field, None)
 
     def _set_udf(self, elt, udf_name, val):
         try:
@@ -417,11 +471,72 @@ class CopyField:
             "Updated {d_elt_type} udf: {d_udf}, from {su} to " "{nv}.".format(**d)
         )
 
-    def copy_udf(self, changelog_f=None):
+    def copy_udf(self, changelog_f=None, batch=None):
         if self.s_field != self.old_dest_udf:
             self._log_before_change(changelog_f)
+            if batch is not None:
+                return batch.stage(self)
             log = self._set_udf(self.d_elt, self.d_udf_name, self.s_field)
             self._log_after_change()
             return log
         else:
             return False
+
+
+class CopyFieldBatch:
+    """Context manager that saves the elements changed by CopyField.copy_udf
+    calls given this batch when the block exits without an exception.
+
+    Artifacts, containers, files and samples are saved with one batch
+    request per type, other elements with one PUT each. The changes are
+    logged once they have been saved.
+
+        with CopyFieldBatch() as batch:
+            for s_elt, d_elt in pairs:
+                CopyField(s_elt, d_elt, "Concentration").copy_udf(batch=batch)
+    """
+
+    def __init__(self):
+        self.staged = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not exc_type:
+            self.flush()
+        # Do not repress possible exception
+        return False
+
+    def stage(self, copy_field):
+        "Set the destination udf of copy_field, to be saved on flush."
+        try:
+            copy_field.d_elt.udf[copy_field.d_udf_name] = copy_field.s_field
+        except TypeError as e:
+            print(f"Error while updating element: {e}", file=sys.stderr)
+            sys.exit(-1)
+        self.staged.append(copy_field)
+        return True
+
+    def flush(self):
+        "Save all elements changed since the last flush and log the changes."
+        # Elements are unique per uri thanks to the Lims cache
+        elements = {}
+        for copy_field in self.staged:
+            elt = copy_field.d_elt
+            elements.setdefault(elt.__class__, {})[elt.uri] = elt
+        try:
+            for klass, elts in elements.items():
+                elts = list(elts.values())
+                lims = elts[0].lims
+                if klass._TAG in lims.BATCH_TAGS:
+                    lims.put_batch(elts)
+                else:
+                    for elt in elts:
+                        elt.put()
+        except (TypeError, HTTPError) as e:
+            print(f"Error while updating element: {e}", file=sys.stderr)
+            sys.exit(-1)
+        for copy_field in self.staged:
+            copy_field._log_after_change()
+        self.staged = []
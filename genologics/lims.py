@@ -17,10 +17,12 @@ __all__ = [
     "Process",
     "Artifact",
     "Lims",
+    "get_default_lims",
 ]
 
 import os
 import re
+import threading
 from io import BytesIO
 
 # python 2.7, 3+ compatibility
@@ -28,7 +30,9 @@ from urllib.parse import urlencode, urljoin
 from xml.etree import ElementTree
 
 import requests
+from requests.adapters import Retry
 
+from genologics import version_cache
 from genologics.constants import nsmap
 
 from .entities import (
@@ -58,11 +62,16 @@ from .entities import (
 
 TIMEOUT = 16
 
+# Lims instances shared within the process, see get_default_lims
+_default_lims: dict[tuple[str, str, str], "Lims"] = {}
+
 
 class Lims:
     "LIMS interface through which all entity instances are retrieved."
 
     VERSION = "v2"
+    # Entity tags supported by the batch retrieve and update calls
+    BATCH_TAGS = ("artifact", "container", "file", "sample")
 
     def __init__(self, baseuri, username, password, version=VERSION):
         """baseuri: Base URI for the GenoLogics server, excluding
@@ -80,10 +89,21 @@ class Lims:
         # For optimization purposes, enables requests to persist connections
         self.request_session = requests.Session()
         # The connection pool has a default size of 10
+        # Idempotent requests are retried on transient gateway errors
         self.adapter = requests.adapters.HTTPAdapter(
-            pool_connections=100, pool_maxsize=100
+            pool_connections=100,
+            pool_maxsize=100,
+            # The last response is returned once retries are exhausted, so
+            # validate_response still raises an HTTPError for it
+            max_retries=Retry(
+                total=5,
+                backoff_factor=0.3,
+                status_forcelist=[502, 503, 504],
+                raise_on_status=False,
+            ),
         )
         self.request_session.mount("http://", self.adapter)
+        self.request_session.mount("https://", self.adapter)
 
     def get_uri(self, *segments, **query):
         "Return the full URI given the path segments and optional query."
@@ -153,11 +173,12 @@ class Lims:
 
         # Actually upload the file
         uri = self.get_uri("files", file.id, "upload")
-        r = requests.post(
-            uri,
-            files={"file": (file_to_upload, open(file_to_upload, "rb"))},
-            auth=(self.username, self.password),
-        )
+        with open(file_to_upload, "rb") as f:
+            r = self.request_session.post(
+                uri,
+                files={"file": (file_to_upload, f)},
+                auth=(self.username, self.password),
+            )
         self.validate_response(r)
         return file
 
@@ -165,7 +186,7 @@ class Lims:
         """PUT the serialized XML to the given URI.
         Return the response XML as an ElementTree.
         """
-        r = requests.put(
+        r = self.request_session.put(
             uri,
             data=data,
             params=params,
@@ -178,7 +199,7 @@ class Lims:
         """POST the serialized XML to the given URI.
         Return the response XML as an ElementTree.
         """
-        r = requests.post(
+        r = self.request_session.post(
             uri,
             data=data,
             params=params,
@@ -191,7 +212,7 @@ class Lims:
         """sends a DELETE to the given URI.
         Return the response XML as an ElementTree.
         """
-        r = requests.delete(
+        r = self.request_session.delete(
             uri,
             params=params,
             auth=(self.username, self.password),
@@ -199,19 +220,47 @@ class Lims:
         )
         return self.validate_response(r, accept_status_codes=[204])
 
-    def check_version(self):
+    def check_version(self, force=False):
         """Raise ValueError if the version for this interface
         does not match any of the versions given for the API.
+
+        The versions given for the API are cached on disk. A cached answer
+        is used directly; if it is older than a day it is also refreshed in
+        the background. Set force to always ask the server.
         """
+        versions, is_stale = None, None
+        if not force:
+            versions, is_stale = version_cache.get_cached_versions(self.baseuri)
+        if versions is None:
+            versions = self._get_versions()
+        elif is_stale:
+            threading.Thread(target=self._refresh_versions, daemon=True).start()
+        if self.VERSION not in versions:
+            raise ValueError("version mismatch")
+
+    def _get_versions(self):
+        "Get the major versions given for the API and update the disk cache."
         uri = urljoin(self.baseuri, "api")
-        r = requests.get(uri, auth=(self.username, self.password))
+        r = self.request_session.get(
+            uri, auth=(self.username, self.password), timeout=TIMEOUT
+        )
         root = self.parse_response(r)
         tag = nsmap("ver:versions")
         assert tag == root.tag
-        for node in root.findall("version"):
-            if node.attrib["major"] == self.VERSION:
-                return
-        raise ValueError("version mismatch")
+        versions = [node.attrib["major"] for node in root.findall("version")]
+        version_cache.store_versions(self.baseuri, versions)
+        return versions
+
+    def _refresh_versions(self):
+        "Update the disk cache, keeping the stale versions if the server fails."
+        try:
+            self._get_versions()
+        except (
+            requests.exceptions.RequestException,
+            ElementTree.ParseError,
+            AssertionError,
+        ):
+            pass
 
     def validate_response(self, response, accept_status_codes=[200]):
         """Parse the XML returned in the response.
@@ -666,12 +715,16 @@ class Lims:
         The batch request API call collapses all requested Artifacts with different
         state into a single result with state equal to the state of the Artifact
         occurring at the last position in the list.
+
+        The returned instances hold their full XML, so reading their
+        attributes does not issue further requests. Related entities (e.g.
+        Artifact.samples) are not retrieved and should be passed to a
+        separate get_batch call rather than fetched one at a time.
         """
         if not instances:
             return []
 
-        ALLOWED_TAGS = ("artifact", "container", "file", "sample")
-        if instances[0]._TAG not in ALLOWED_TAGS:
+        if instances[0]._TAG not in self.BATCH_TAGS:
             raise TypeError(
                 f"Cannot retrieve batch for instances of type '{instances[0]._TAG}'"
             )
@@ -702,8 +755,7 @@ class Lims:
         if not instances:
             return
 
-        ALLOWED_TAGS = ("artifact", "container", "file", "sample")
-        if instances[0]._TAG not in ALLOWED_TAGS:
+        if instances[0]._TAG not in self.BATCH_TAGS:
             raise TypeError(
                 f"Cannot update batch for instances of type '{instances[0]._TAG}'"
             )
@@ -741,7 +793,7 @@ class Lims:
             a.set("uri", artifact.uri)
 
         uri = self.get_uri("route", "artifacts")
-        r = requests.post(
+        r = self.request_session.post(
             uri,
             data=self.tostring(ElementTree.ElementTree(root)),
             auth=(self.username, self.password),
@@ -777,3 +829,18 @@ class Lims:
         ret_con.root = ret_el
 
         return ret_con
+
+
+def get_default_lims(baseuri, username, password, version=Lims.VERSION):
+    """Return the Lims instance shared within this process for the given
+    server and user, creating it on first use. Scripts running in the same
+    interpreter then reuse its connection pool and entity cache.
+
+    Raise ValueError if the shared instance was created with another
+    password."""
+    key = (baseuri.rstrip("/") + "/", username, version)
+    if key not in _default_lims:
+        _default_lims[key] = Lims(baseuri, username, password, version=version)
+    elif _default_lims[key].password != password:
+        raise ValueError(f"Lims for {username} already exists with another password")
+    return _default_lims[key]
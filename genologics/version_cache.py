@@ -0,0 +1,53 @@
+"""On-disk cache of the API versions supported by LIMS servers.
+
+The cache is a JSON file mapping each base URI to the list of supported
+major versions and the time they were fetched. Any problem reading or
+writing the file is treated as a cache miss, so the cache can never make
+a script fail.
+"""
+
+import json
+import os
+import time
+
+VERSION_CACHE = os.path.expanduser("~/.genologics/version.json")
+# Cached versions older than this (in seconds) are revalidated in the background
+MAX_AGE = 24 * 60 * 60
+
+
+def _read_cache(cache_file):
+    try:
+        with open(cache_file) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def get_cached_versions(baseuri, cache_file=None):
+    """Return (versions, is_stale) for the given base URI,
+    or (None, None) if nothing is cached."""
+    cache = _read_cache(cache_file or VERSION_CACHE)
+    try:
+        entry = cache[baseuri]
+        versions = list(entry["versions"])
+        age = time.time() - float(entry["fetched_at"])
+    except (KeyError, TypeError, ValueError):
+        return None, None
+    return versions, age > MAX_AGE
+
+
+def store_versions(baseuri, versions, cache_file=None):
+    "Store the supported versions for the given base URI."
+    cache_file = cache_file or VERSION_CACHE
+    cache = _read_cache(cache_file)
+    cache[baseuri] = {"versions": list(versions), "fetched_at": time.time()}
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(tmp_file, "w") as f:
+            json.dump(cache, f)
+        # Atomic, so concurrent scripts never read a partially written file
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
@@ -218,7 +218,7 @@ class TestStepActions(TestEntities):
             return_value=Mock(content=self.step_actions_xml, status_code=200),
         ):
             with patch(
-                "requests.post",
+                "requests.Session.post",
                 return_value=Mock(content=self.dummy_xml, status_code=200),
             ):
                 r = Researcher(
@@ -433,7 +433,7 @@ class TestReagentKits(TestEntities):
 
     def test_create_entity(self):
         with patch(
-            "genologics.lims.requests.post",
+            "requests.Session.post",
             return_value=Mock(content=self.reagentkit_xml, status_code=201),
         ):
             ReagentKit.create(
@@ -468,7 +468,7 @@ class TestReagentLots(TestEntities):
         ):
             r = ReagentKit(uri=self.lims.get_uri("reagentkits", "r1"), lims=self.lims)
         with patch(
-            "genologics.lims.requests.post",
+            "requests.Session.post",
             return_value=Mock(content=self.reagentlot_xml, status_code=201),
         ):
             l = ReagentLot.create(
@@ -489,7 +489,7 @@ class TestSample(TestEntities):
 
     def test_create_entity(self):
         with patch(
-            "genologics.lims.requests.post",
+            "requests.Session.post",
             return_value=Mock(content=self.sample_creation, status_code=201),
         ) as patch_post:
             Sample.create(
@@ -0,0 +1,219 @@
+import logging
+import os
+import sys
+import tempfile
+from unittest import TestCase
+from unittest.mock import Mock, patch
+from xml.etree import ElementTree
+
+from genologics.entities import Artifact
+from genologics.epp import (
+    CopyField,
+    CopyFieldBatch,
+    EppLogger,
+    ReadResultFiles,
+    attach_files,
+)
+from genologics.lims import Lims
+
+
+class TestAttachFiles(TestCase):
+    def test_attach_files(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            src = os.path.join(tmp_dir, "report.pdf")
+            with open(src, "w") as f:
+                f.write("content")
+            dest_dir = os.path.join(tmp_dir, "dest")
+            os.mkdir(dest_dir)
+            locations = attach_files(
+                [(src, Mock(id="92-1")), (src, Mock(id="92-2"))], dest_dir=dest_dir
+            )
+            assert locations == [
+                os.path.join(dest_dir, "92-1_report.pdf"),
+                os.path.join(dest_dir, "92-2_report.pdf"),
+            ]
+            for location in locations:
+                with open(location) as f:
+                    assert f.read() == "content"
+
+
+class TestStreamToLogger(TestCase):
+    def test_write(self):
+        logger = Mock()
+        stream = Mock()
+        slo = EppLogger.StreamToLogger(logger, stream=stream)
+        slo.write("first line  \nsecond line\n\n")
+        slo.write("\n")
+        logger.log.assert_called_once_with(logging.INFO, "first line\nsecond line")
+        assert stream.write.call_count == 2
+
+
+class TestEppLogger(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_file = os.path.join(self.tmp_dir.name, "epp.log")
+        root = logging.getLogger()
+        self.saved_handlers = root.handlers[:]
+        self.saved_level = root.level
+        self.saved_streams = (sys.stdout, sys.stderr)
+        # Stopping the listener at exit is called by the tests instead
+        self.stop_at_exit = []
+        for target, value in [
+            ("genologics.epp.MAIN_LOG", None),
+            ("genologics.epp.version", Mock(return_value="1.0")),
+            ("genologics.epp.atexit.register", self.stop_at_exit.append),
+        ]:
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            if handler not in self.saved_handlers:
+                root.removeHandler(handler)
+                handler.close()
+        root.setLevel(self.saved_level)
+        sys.stdout, sys.stderr = self.saved_streams
+        self.tmp_dir.cleanup()
+
+    def _read_log(self):
+        with open(self.log_file) as f:
+            return f.read()
+
+    def test_log_file(self):
+        with EppLogger(self.log_file):
+            logging.info("in block")
+            print("printed")
+        logging.warning("after exit")
+        log = self._read_log()
+        assert "INFO:root:in block" in log
+        assert "INFO:STDOUT:printed" in log
+        assert "WARNING:root:after exit" in log
+
+    def test_log_file_after_exception(self):
+        with self.assertRaises(RuntimeError):
+            with EppLogger(self.log_file):
+                raise RuntimeError("boom")
+        logging.error("after exception")
+        # As done by atexit when the interpreter exits
+        for stop in self.stop_at_exit:
+            stop()
+        assert "ERROR:root:after exception" in self._read_log()
+
+
+class TestReadResultFiles(TestCase):
+    csv_content = "Sample,Conc\r\nA1,1.5\r\nB1,2.0\r\n"
+    txt_content = "Sample\tConc\\\nA1\t1.5\\\n"
+
+    def _process(self, file_paths):
+        outputs = []
+        for name, path in file_paths.items():
+            artifact = Mock(output_type="SharedResultFile", files=[Mock()])
+            artifact.name = name
+            artifact.file_path = path
+            outputs.append(artifact)
+        return Mock(all_outputs=Mock(return_value=outputs))
+
+    def test_pars_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_paths = {}
+            for name, content in [
+                ("csv_file", self.csv_content),
+                ("txt_file", self.txt_content),
+            ]:
+                ext = name.split("_")[0]
+                file_paths[name] = os.path.join(tmp_dir, f"{name}.{ext}")
+                with open(file_paths[name], "w", newline="") as f:
+                    f.write(content)
+            with patch.object(
+                ReadResultFiles,
+                "get_file_path",
+                side_effect=lambda artifact: artifact.file_path,
+            ):
+                rrf = ReadResultFiles(self._process(file_paths))
+
+        assert rrf.shared_files["csv_file"] == [
+            ["Sample", "Conc"],
+            ["A1", "1.5"],
+            ["B1", "2.0"],
+        ]
+        assert rrf.shared_files["txt_file"] == [["Sample", "Conc"], ["A1", "1.5"]]
+        assert rrf.perinput_files == {}
+
+    def test_format_file(self):
+        parsed_file = [
+            ["Some", "preamble"],
+            ["Sample", "Conc", "", "Volume"],
+            ["A1", "1.5", "ng/ul", "10"],
+            ["Fail", "0", "ng/ul", "0"],
+            ["B1", "2.0", "ng/ul", "20"],
+        ]
+        rrf = ReadResultFiles(Mock(all_outputs=Mock(return_value=[])))
+        file_info = rrf.format_file(parsed_file, first_header="Sample")
+        assert file_info == {
+            "A1": {"Sample": "A1", "Conc": ("1.5", "ng/ul"), "Volume": "10"},
+            "B1": {"Sample": "B1", "Conc": ("2.0", "ng/ul"), "Volume": "20"},
+        }
+        file_info = rrf.format_file(parsed_file, header_row=1, find_keys=["B1"])
+        assert list(file_info) == ["B1"]
+
+        with patch("sys.stderr"):
+            self.assertRaises(
+                SystemExit,
+                rrf.format_file,
+                parsed_file + [parsed_file[2]],
+                header_row=1,
+            )
+
+
+class TestCopyField(TestCase):
+    url = "http://testgenologics.com:4040"
+    artifact_xml = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<art:artifact xmlns:art="http://genologics.com/ri/artifact" xmlns:udf="http://genologics.com/ri/userdefined" uri="{url}/api/v2/artifacts/{id}" limsid="{id}">
+<name>{id}</name>
+<volume>10</volume>
+<udf:field type="Numeric" name="Concentration">{conc}</udf:field>
+</art:artifact>"""
+
+    def _artifact(self, lims, id, conc):
+        artifact = Artifact(lims, id=id)
+        artifact.root = ElementTree.fromstring(
+            self.artifact_xml.format(url=self.url, id=id, conc=conc)
+        )
+        return artifact
+
+    def test_copy_udf(self):
+        lims = Lims(self.url, username="test", password="password")
+        sources = [self._artifact(lims, f"s{i}", i) for i in range(3)]
+        dest = [self._artifact(lims, f"d{i}", 1) for i in range(3)]
+        with patch.object(Lims, "put_batch") as mocked_put_batch:
+            with CopyFieldBatch() as batch:
+                for s_elt, d_elt in zip(sources, dest):
+                    CopyField(s_elt, d_elt, "Concentration").copy_udf(batch=batch)
+                assert mocked_put_batch.call_count == 0
+        # The unchanged d1 is not staged, the others are saved in one request
+        mocked_put_batch.assert_called_once_with([dest[0], dest[2]])
+        assert [d.udf["Concentration"] for d in dest] == [0, 1, 2]
+
+    def test_get_field(self):
+        lims = Lims(self.url, username="test", password="password")
+        source = self._artifact(lims, "s0", 2)
+        dest = self._artifact(lims, "d0", 1)
+        copy_field = CopyField(source, dest, "name", "Concentration")
+        assert copy_field.s_field == "s0"
+        assert copy_field.old_dest_udf == 1
+        assert copy_field._get_field(source, "missing") is None
+
+    def test_dest_udf_named_like_attribute(self):
+        lims = Lims(self.url, username="test", password="password")
+        source = self._artifact(lims, "s0", 10)
+        dest = self._artifact(lims, "d0", 1)
+        # The unset volume udf must not be read from the volume element
+        copy_field = CopyField(source, dest, "Concentration", "volume")
+        assert copy_field.old_dest_udf is None
+        with patch.object(Lims, "put_batch") as mocked_put_batch:
+            with CopyFieldBatch() as batch:
+                assert copy_field.copy_udf(batch=batch)
+        mocked_put_batch.assert_called_once_with([dest])
+        assert dest.udf["volume"] == 10
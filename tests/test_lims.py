@@ -2,7 +2,7 @@ from unittest import TestCase
 
 from requests.exceptions import HTTPError
 
-from genologics.lims import Lims
+from genologics.lims import Lims, get_default_lims
 
 try:
     callable(1)
@@ -14,6 +14,9 @@ except NameError:  # callable() doesn't exist in Python 3.0 and 3.1
 
 
 import builtins
+import json
+import os
+import tempfile
 from unittest.mock import Mock, patch
 
 
@@ -25,6 +28,11 @@ class TestLims(TestCase):
 <smp:samples xmlns:smp="http://genologics.com/ri/sample">
     <sample uri="{url}/api/v2/samples/test_sample" limsid="test_id"/>
 </smp:samples>
+"""
+    versions_xml = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<ver:versions xmlns:ver="http://genologics.com/ri/version">
+    <version uri="{url}/api/v2" major="v2" minor="31"/>
+</ver:versions>
 """
     error_xml = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
 <exc:exception xmlns:exc="http://genologics.com/ri/exception">
@@ -77,12 +85,14 @@ class TestLims(TestCase):
         lims = Lims(self.url, username=self.username, password=self.password)
         uri = f"{self.url}/api/v2/samples/test_sample"
         with patch(
-            "requests.put", return_value=Mock(content=self.sample_xml, status_code=200)
+            "requests.Session.put",
+            return_value=Mock(content=self.sample_xml, status_code=200),
         ) as mocked_put:
             lims.put(uri=uri, data=self.sample_xml)
             assert mocked_put.call_count == 1
         with patch(
-            "requests.put", return_value=Mock(content=self.error_xml, status_code=400)
+            "requests.Session.put",
+            return_value=Mock(content=self.error_xml, status_code=400),
         ) as mocked_put:
             self.assertRaises(HTTPError, lims.put, uri=uri, data=self.sample_xml)
             assert mocked_put.call_count == 1
@@ -91,12 +101,14 @@ class TestLims(TestCase):
         lims = Lims(self.url, username=self.username, password=self.password)
         uri = f"{self.url}/api/v2/samples"
         with patch(
-            "requests.post", return_value=Mock(content=self.sample_xml, status_code=200)
+            "requests.Session.post",
+            return_value=Mock(content=self.sample_xml, status_code=200),
         ) as mocked_put:
             lims.post(uri=uri, data=self.sample_xml)
             assert mocked_put.call_count == 1
         with patch(
-            "requests.post", return_value=Mock(content=self.error_xml, status_code=400)
+            "requests.Session.post",
+            return_value=Mock(content=self.error_xml, status_code=400),
         ) as mocked_put:
             self.assertRaises(HTTPError, lims.post, uri=uri, data=self.sample_xml)
             assert mocked_put.call_count == 1
@@ -119,7 +131,7 @@ class TestLims(TestCase):
             [xml_intro, file_start2, attached, upload, content_loc, file_end]
         ).format(url=self.url)
         with patch(
-            "requests.post",
+            "requests.Session.post",
             side_effect=[
                 Mock(content=glsstorage_xml, status_code=200),
                 Mock(content=file_post_xml, status_code=200),
@@ -132,7 +144,8 @@ class TestLims(TestCase):
             assert file.id == "40-3501"
 
         with patch(
-            "requests.post", side_effect=[Mock(content=self.error_xml, status_code=400)]
+            "requests.Session.post",
+            side_effect=[Mock(content=self.error_xml, status_code=400)],
         ):
             self.assertRaises(
                 HTTPError,
@@ -141,7 +154,9 @@ class TestLims(TestCase):
                 "filename_to_upload",
             )
 
-    @patch("requests.post", return_value=Mock(content=sample_xml, status_code=200))
+    @patch(
+        "requests.Session.post", return_value=Mock(content=sample_xml, status_code=200)
+    )
     def test_route_artifact(self, mocked_post):
         lims = Lims(self.url, username=self.username, password=self.password)
         artifact = Mock(uri=self.url + "/artifact/2")
@@ -151,6 +166,67 @@ class TestLims(TestCase):
         )
         assert mocked_post.call_count == 1
 
+    def test_check_version(self):
+        lims = Lims(self.url, username=self.username, password=self.password)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_file = os.path.join(tmp_dir, "version.json")
+            with (
+                patch("genologics.version_cache.VERSION_CACHE", cache_file),
+                patch(
+                    "requests.Session.get",
+                    return_value=Mock(content=self.versions_xml, status_code=200),
+                ) as mocked_get,
+            ):
+                lims.check_version()
+                assert mocked_get.call_count == 1
+                # The second check is answered from the cache
+                lims.check_version()
+                assert mocked_get.call_count == 1
+                lims.check_version(force=True)
+                assert mocked_get.call_count == 2
+                lims.VERSION = "v1"
+                self.assertRaises(ValueError, lims.check_version)
+
+    def test_check_version_stale(self):
+        lims = Lims(self.url, username=self.username, password=self.password)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_file = os.path.join(tmp_dir, "version.json")
+            with open(cache_file, "w") as f:
+                json.dump({lims.baseuri: {"versions": ["v2"], "fetched_at": 0}}, f)
+            with open(cache_file) as f:
+                cached = f.read()
+
+            # Run the background refresh in this thread
+            def run_target(target, daemon):
+                return Mock(start=target)
+
+            for failed_response in [
+                Mock(content=self.error_xml, status_code=500),
+                Mock(content=self.sample_xml, status_code=200),
+            ]:
+                with (
+                    patch("genologics.version_cache.VERSION_CACHE", cache_file),
+                    patch("genologics.lims.threading.Thread", side_effect=run_target),
+                    patch(
+                        "requests.Session.get", return_value=failed_response
+                    ) as mocked_get,
+                ):
+                    # The stale versions are used and kept on a failed refresh
+                    lims.check_version()
+                    assert mocked_get.call_count == 1
+                with open(cache_file) as f:
+                    assert f.read() == cached
+
+    @patch.dict("genologics.lims._default_lims", clear=True)
+    def test_get_default_lims(self):
+        lims = get_default_lims(self.url, self.username, self.password)
+        assert isinstance(lims, Lims)
+        assert get_default_lims(self.url + "/", self.username, self.password) is lims
+        assert get_default_lims(self.url, "other", self.password) is not lims
+        self.assertRaises(
+            ValueError, get_default_lims, self.url, self.username, "other"
+        )
+
     def test_tostring(self):
         lims = Lims(self.url, username=self.username, password=self.password)
         from xml.etree import ElementTree as ET